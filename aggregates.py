@@ -0,0 +1,223 @@
+"""Agregados de un registro de entrenamiento.
+
+`AgregadosEntrenamiento` resume las filas limpias en acumulados por sesión
+(Fecha), por Lugar/Periodo, la distribución de ritmos y los destacados. Las
+pestañas de `visualization.py` leen siempre estos agregados: en modo normal se
+construyen una vez a partir del DataFrame completo (`como_agregados`) y en modo
+streaming bloque a bloque (`streaming.py`), sin conservar todas las filas.
+"""
+import hashlib
+
+import pandas as pd
+
+from data_processing import COLUMNAS_ESPERADAS
+from distribution import DistribucionRitmos
+
+
+MAX_FILAS_MUESTRA = 1000  # filas conservadas en modo streaming para la tabla "Datos Completos"
+N_MEJORES_SESIONES = 5
+
+
+class AgregadosEntrenamiento:
+    """Acumulados de un registro de entrenamiento, actualizados bloque a bloque.
+
+    `max_muestra` limita las filas que se conservan para la tabla completa
+    (None = todas, como en el modo normal).
+    """
+
+    def __init__(self, max_muestra=MAX_FILAS_MUESTRA):
+        self.n_filas = 0
+        self.sesiones_totales = 0       # filas con Distancia_km == 1 (inicio de sesión)
+        self.km_max = None
+        self.mejor_ritmo = None
+        self.mejor_fecha = None
+        self.mejor_lugar = ""
+        self._distribuciones = {}       # origen (archivo/atleta) -> DistribucionRitmos
+        self._distribucion = None
+        self.max_muestra = max_muestra
+        self._muestra = []
+        self._n_muestra = 0
+        self._suma_ritmo_ns = 0         # enteros: el promedio coincide con `Ritmos.mean()`
+        self._sesiones = None   # por Fecha: n, suma_ns, Distancia_km (máxima)
+        self._lugares = None    # por (Lugar, Periodo): conteo de filas
+        self._mejores = []
+        self._fechas_con_filas = set()  # sesiones cuyas filas están todas en _mejores
+        self._huella = hashlib.sha1()
+
+    def agregar(self, bloque, origen=""):
+        """Incorpora un bloque ya limpio (salida de `normalizar_datos`) del archivo `origen`."""
+        if bloque.empty:
+            return self
+        ritmos_ns = bloque["Ritmos"].astype("int64")
+        self._huella.update(pd.util.hash_pandas_object(bloque, index=True).values.tobytes())
+
+        self.n_filas += len(bloque)
+        self.sesiones_totales += int((bloque["Distancia_km"] == 1).sum())
+        km = int(bloque["Distancia_km"].max())
+        self.km_max = km if self.km_max is None else max(self.km_max, km)
+        self._suma_ritmo_ns += int(ritmos_ns.sum())
+        self._distribuciones.setdefault(origen, DistribucionRitmos()).agregar(
+            bloque["Ritmos"].dt.total_seconds() / 60.0
+        )
+        self._distribucion = None
+
+        # Primer registro con el mejor ritmo, igual que en el modo normal
+        minimo = bloque["Ritmos"].min()
+        if self.mejor_ritmo is None or minimo < self.mejor_ritmo:
+            fila = bloque.loc[bloque["Ritmos"] == minimo].iloc[0]
+            self.mejor_ritmo = minimo
+            self.mejor_fecha = fila["Fecha"]
+            self.mejor_lugar = str(fila["Lugar"])
+
+        por_fecha = pd.DataFrame({
+            "n": bloque.groupby("Fecha").size(),
+            "suma_ns": ritmos_ns.groupby(bloque["Fecha"]).sum(),
+            "Distancia_km": bloque.groupby("Fecha")["Distancia_km"].max(),
+        })
+        if self._sesiones is not None:
+            por_fecha = pd.concat([self._sesiones, por_fecha]).groupby(level=0).agg(
+                {"n": "sum", "suma_ns": "sum", "Distancia_km": "max"}
+            )
+        self._sesiones = por_fecha
+
+        conteo = bloque.groupby(["Lugar", "Periodo"]).size()
+        self._lugares = conteo if self._lugares is None else self._lugares.add(conteo, fill_value=0)
+
+        self._guardar_muestra(bloque)
+        return self
+
+    def combinar(self, otros):
+        """Incorpora los acumulados de `otros` (p. ej. de otro archivo) en estos."""
+        if otros.empty:
+            return self
+        self._huella.update(otros.huella.encode("utf-8"))
+        self.n_filas += otros.n_filas
+        self.sesiones_totales += otros.sesiones_totales
+        self.km_max = otros.km_max if self.km_max is None else max(self.km_max, otros.km_max)
+        self._suma_ritmo_ns += otros._suma_ritmo_ns
+        if self.mejor_ritmo is None or otros.mejor_ritmo < self.mejor_ritmo:
+            self.mejor_ritmo = otros.mejor_ritmo
+            self.mejor_fecha = otros.mejor_fecha
+            self.mejor_lugar = otros.mejor_lugar
+        # Una sesión repartida entre ambos solo tiene sus filas completas si las tienen los dos
+        propias, ajenas = self._fechas_sesiones(), otros._fechas_sesiones()
+        self._fechas_con_filas = {
+            f for f in self._fechas_con_filas | otros._fechas_con_filas
+            if (f not in propias or f in self._fechas_con_filas)
+            and (f not in ajenas or f in otros._fechas_con_filas)
+        }
+        self._mejores.extend(otros._mejores)
+        for origen, dist in otros._distribuciones.items():
+            self._distribuciones.setdefault(origen, DistribucionRitmos()).combinar(dist)
+        self._distribucion = None
+
+        sesiones = otros._sesiones
+        if self._sesiones is not None:
+            sesiones = pd.concat([self._sesiones, sesiones]).groupby(level=0).agg(
+                {"n": "sum", "suma_ns": "sum", "Distancia_km": "max"}
+            )
+        self._sesiones = sesiones
+        self._lugares = otros._lugares if self._lugares is None else self._lugares.add(otros._lugares, fill_value=0)
+
+        for parte in otros._muestra:
+            self._guardar_muestra(parte)
+        return self
+
+    def _guardar_muestra(self, parte):
+        if self.max_muestra is not None:
+            parte = parte.iloc[:max(self.max_muestra - self._n_muestra, 0)]
+        if not parte.empty:
+            self._muestra.append(parte)
+            self._n_muestra += len(parte)
+
+    def fechas_mejores_sesiones(self, n=N_MEJORES_SESIONES):
+        """Fechas de las `n` sesiones con menor ritmo promedio."""
+        return list(self.por_sesion().nsmallest(n, "Ritmo_promedio")["Fecha"])
+
+    def agregar_filas_mejores(self, filas, fechas):
+        """Conserva las filas de las sesiones en `fechas`; `filas` debe incluirlas todas."""
+        seleccion = filas[filas["Fecha"].isin(fechas)]
+        if not seleccion.empty:
+            self._mejores.append(seleccion)
+        self._fechas_con_filas.update(set(fechas) & self._fechas_sesiones())
+
+    def fechas_sin_filas(self, fechas):
+        """Fechas de `fechas` con sesión en estos agregados cuyas filas no se conservaron."""
+        sesiones = self._fechas_sesiones()
+        return [f for f in fechas if f in sesiones and f not in self._fechas_con_filas]
+
+    def _fechas_sesiones(self):
+        return set() if self._sesiones is None else set(self._sesiones.index)
+
+    # =========================
+    # Vistas para las pestañas
+    # =========================
+    @property
+    def empty(self):
+        return self.n_filas == 0
+
+    @property
+    def distribucion(self):
+        """Distribución de ritmos total, combinada de los resúmenes por archivo (atleta)."""
+        if self._distribucion is None:
+            self._distribucion = DistribucionRitmos.combinar_todas(
+                self._distribuciones[o] for o in sorted(self._distribuciones)
+            )
+        return self._distribucion
+
+    @property
+    def huella(self):
+        return self._huella.hexdigest()
+
+    @property
+    def ritmo_promedio(self):
+        return pd.to_timedelta(self._suma_ritmo_ns / self.n_filas, unit="ns") if self.n_filas else pd.NaT
+
+    def por_sesion(self):
+        """Una fila por Fecha: Distancia_km (máxima), Ritmos (promedio) y Ritmo_promedio en minutos."""
+        if self._sesiones is None:
+            return pd.DataFrame({
+                "Fecha": pd.Series(dtype="datetime64[ns]"),
+                "Distancia_km": pd.Series(dtype="int64"),
+                "Ritmos": pd.Series(dtype="timedelta64[ns]"),
+                "Ritmo_promedio": pd.Series(dtype="float64"),
+            })
+        sesiones = self._sesiones.rename_axis("Fecha").reset_index()
+        sesiones["Ritmos"] = pd.to_timedelta(sesiones["suma_ns"] / sesiones["n"], unit="ns")
+        sesiones["Ritmo_promedio"] = sesiones["Ritmos"].dt.total_seconds() / 60.0
+        return sesiones[["Fecha", "Distancia_km", "Ritmos", "Ritmo_promedio"]]
+
+    def por_lugar_periodo(self):
+        """Conteo de km por (Lugar, Periodo), como `groupby([...]).size()`."""
+        if self._lugares is None:
+            return pd.DataFrame(columns=["Lugar", "Periodo", "Conteo"])
+        conteo = self._lugares.astype("int64")
+        conteo.index.names = ["Lugar", "Periodo"]
+        return conteo.reset_index(name="Conteo")
+
+    def filas_mejores_sesiones(self):
+        """Filas de las sesiones de `fechas_mejores_sesiones()`."""
+        if not self._mejores:
+            return pd.DataFrame(columns=COLUMNAS_ESPERADAS)
+        filas = pd.concat(self._mejores)
+        return filas[filas["Fecha"].isin(self.fechas_mejores_sesiones())]
+
+    def muestra(self):
+        """Filas conservadas del registro: todas, o las primeras `max_muestra` en modo streaming."""
+        if not self._muestra:
+            return pd.DataFrame(columns=COLUMNAS_ESPERADAS)
+        return pd.concat(self._muestra)
+
+
+def como_agregados(datos):
+    """Devuelve `datos` si ya son agregados; si es un DataFrame limpio, sus agregados.
+
+    En modo normal se conservan todas las filas (tabla completa y sesiones).
+    """
+    if isinstance(datos, AgregadosEntrenamiento):
+        return datos
+    agregados = AgregadosEntrenamiento(max_muestra=None)
+    agregados.agregar(datos)
+    if not agregados.empty:
+        agregados.agregar_filas_mejores(datos, agregados.fechas_mejores_sesiones())
+    return agregados
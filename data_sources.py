@@ -0,0 +1,337 @@
+"""Fuentes de datos para los reportes.
+
+Cada fuente obtiene los bytes de uno o varios XLSX y los pasa por el mismo
+pipeline de limpieza (`normalizar_datos`). Los fallos se reportan con
+`ErrorFuenteDatos`, sin llamadas a Streamlit; la interfaz decide cómo mostrarlos.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from glob import glob
+from io import BytesIO
+from urllib.parse import urlparse
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from data_processing import normalizar_datos
+
+
+URL_DESCARGA_DRIVE = "https://drive.google.com/uc?export=download&id={id_archivo}"
+TAM_BLOQUE_DESCARGA = 1 << 16  # 64 KiB por bloque en descargas en streaming
+
+
+# =========================
+# Errores
+# =========================
+class ErrorFuenteDatos(Exception):
+    """Error al obtener o limpiar datos de una fuente.
+
+    `etapa` indica dónde falló: "origen" (ruta/URL no válida), "descarga",
+    "lectura" (XLSX ilegible) o "validacion" (formato de columnas/valores).
+    """
+
+    def __init__(self, mensaje, origen="", etapa="lectura", causa=None):
+        super().__init__(mensaje)
+        self.mensaje = mensaje
+        self.origen = origen
+        self.etapa = etapa
+        self.causa = causa
+
+    def __str__(self):
+        return self.mensaje
+
+
+# =========================
+# Base
+# =========================
+class FuenteDatos:
+    """Fuente de un único XLSX. Las subclases implementan `leer_bytes`."""
+
+    origen = ""
+
+    def leer_bytes(self):
+        raise NotImplementedError
+
+    @contextmanager
+    def abrir_archivo(self):
+        """Ruta u objeto archivo con el XLSX, para leerlo por bloques (modo streaming)."""
+        yield BytesIO(self.leer_bytes())
+
+    def leer(self):
+        """Devuelve el DataFrame crudo tal como viene en el XLSX."""
+        return leer_xlsx(self.leer_bytes(), self.origen)
+
+    def cargar(self):
+        """Devuelve el DataFrame validado y limpio."""
+        return _limpiar(self.leer(), self.origen)
+
+
+def leer_xlsx(contenido, origen=""):
+    """DataFrame crudo a partir de los bytes de un XLSX."""
+    try:
+        return pd.read_excel(BytesIO(contenido), engine="openpyxl")
+    except Exception as e:
+        raise ErrorFuenteDatos(
+            f"No se pudo leer el archivo XLSX ({origen}): {e}",
+            origen=origen, etapa="lectura", causa=e
+        )
+
+
+def _limpiar(df_crudo, origen):
+    try:
+        return normalizar_datos(df_crudo)
+    except ValueError as e:
+        raise ErrorFuenteDatos(str(e), origen=origen, etapa="validacion", causa=e)
+
+
+# =========================
+# Archivo local
+# =========================
+class FuenteLocal(FuenteDatos):
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.origen = ruta
+
+    def leer_bytes(self):
+        try:
+            with open(self.ruta, "rb") as f:
+                return f.read()
+        except OSError as e:
+            raise ErrorFuenteDatos(
+                f"No se pudo abrir el archivo local '{self.ruta}': {e}",
+                origen=self.origen, etapa="origen", causa=e
+            )
+
+    @contextmanager
+    def abrir_archivo(self):
+        if not os.path.isfile(self.ruta):
+            raise ErrorFuenteDatos(
+                f"No se pudo abrir el archivo local '{self.ruta}': no existe.",
+                origen=self.origen, etapa="origen"
+            )
+        yield self.ruta
+
+
+# =========================
+# HTTP genérico
+# =========================
+_sesion_http = None
+
+
+def sesion_http():
+    """Sesión `requests` compartida, con pool de conexiones reutilizables entre descargas."""
+    global _sesion_http
+    if _sesion_http is None:
+        sesion = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=2)
+        sesion.mount("http://", adaptador)
+        sesion.mount("https://", adaptador)
+        _sesion_http = sesion
+    return _sesion_http
+
+
+class FuenteHTTP(FuenteDatos):
+    def __init__(self, url, sesion=None, timeout=30, tam_bloque=TAM_BLOQUE_DESCARGA):
+        self.url = url
+        self.origen = url
+        self.sesion = sesion
+        self.timeout = timeout
+        self.tam_bloque = tam_bloque
+
+    def url_descarga(self):
+        return self.url
+
+    def _descargar(self, destino):
+        sesion = self.sesion or sesion_http()
+        try:
+            with sesion.get(self.url_descarga(), stream=True, timeout=self.timeout) as respuesta:
+                respuesta.raise_for_status()
+                for bloque in respuesta.iter_content(chunk_size=self.tam_bloque):
+                    destino.write(bloque)
+        except requests.RequestException as e:
+            raise ErrorFuenteDatos(
+                f"Error al descargar el archivo desde la URL: {e}",
+                origen=self.origen, etapa="descarga", causa=e
+            )
+
+    def leer_bytes(self):
+        buffer = BytesIO()
+        self._descargar(buffer)
+        return buffer.getvalue()
+
+    @contextmanager
+    def abrir_archivo(self):
+        # La descarga va a un archivo temporal en disco, no a memoria
+        with tempfile.TemporaryFile(suffix=".xlsx") as temporal:
+            self._descargar(temporal)
+            temporal.seek(0)
+            yield temporal
+
+
+class FuenteGoogleDrive(FuenteHTTP):
+    """Enlace compartido de Google Drive (`.../d/<id>/...`) descargado vía `uc?export=download`."""
+
+    patron = r"/d/([a-zA-Z0-9_-]+)"
+
+    def __init__(self, url, url_descarga=URL_DESCARGA_DRIVE, **kwargs):
+        super().__init__(url, **kwargs)
+        self.plantilla_descarga = url_descarga
+
+    def url_descarga(self):
+        coincidencia = re.search(self.patron, self.url)
+        if not coincidencia:
+            raise ErrorFuenteDatos(
+                "La URL proporcionada no es válida o no contiene un ID de archivo de Google Drive.",
+                origen=self.origen, etapa="origen"
+            )
+        return self.plantilla_descarga.format(id_archivo=coincidencia.group(1))
+
+
+# =========================
+# Directorio vigilado
+# =========================
+def _hash_archivo(ruta, tam_bloque=TAM_BLOQUE_DESCARGA):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(tam_bloque), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class FuenteDirectorio:
+    """Directorio donde los sistemas de cronometraje escriben XLSX.
+
+    Recuerda (mtime, tamaño, hash) de cada archivo; `actualizar` solo vuelve a
+    leer y limpiar los que cambiaron. Si cambia el mtime pero no el contenido,
+    el archivo no se recarga.
+
+    Por defecto los datos de cada archivo son su DataFrame limpio; el modo
+    streaming pasa un `cargar_archivo` que devuelve sus agregados parciales.
+    """
+
+    def __init__(self, ruta, patron="*.xlsx"):
+        self.ruta = ruta
+        self.origen = ruta
+        self.patron = patron
+        self._estado = {}   # ruta -> (mtime_ns, tamaño, hash)
+        self._datos = {}    # ruta -> datos del archivo (DataFrame limpio o agregados)
+        self.errores = {}   # ruta -> ErrorFuenteDatos del último intento
+
+    def _archivos(self):
+        if not os.path.isdir(self.ruta):
+            raise ErrorFuenteDatos(
+                f"El directorio '{self.ruta}' no existe.", origen=self.origen, etapa="origen"
+            )
+        # Excluye los archivos temporales de bloqueo de Excel (~$...)
+        return sorted(
+            p for p in glob(os.path.join(self.ruta, self.patron))
+            if not os.path.basename(p).startswith("~$")
+        )
+
+    def instantanea(self):
+        """Estado actual del directorio: {ruta: (mtime_ns, tamaño, hash)}.
+
+        Solo se recalcula el hash de los archivos cuyo mtime o tamaño cambió.
+        """
+        estado = {}
+        for ruta in self._archivos():
+            try:
+                st_archivo = os.stat(ruta)
+            except OSError:
+                continue  # borrado entre el listado y el stat
+            previo = self._estado.get(ruta)
+            if previo and previo[:2] == (st_archivo.st_mtime_ns, st_archivo.st_size):
+                estado[ruta] = previo
+            else:
+                estado[ruta] = (st_archivo.st_mtime_ns, st_archivo.st_size, _hash_archivo(ruta))
+        return estado
+
+    def actualizar(self, cargar_archivo=None):
+        """Recarga los archivos nuevos o modificados; devuelve las rutas recargadas o eliminadas.
+
+        `cargar_archivo(ruta)` devuelve los datos de un archivo (por defecto, su
+        DataFrame limpio). El estado se registra al terminar: si el proceso se
+        interrumpe, los cambios se vuelven a detectar en la siguiente llamada.
+        """
+        cargar_archivo = cargar_archivo or _cargar_local
+        estado = self.instantanea()
+        eliminados = sorted(set(self._estado) - set(estado))
+        modificados = [
+            ruta for ruta, firma in estado.items()
+            if ruta not in self._estado or self._estado[ruta][2] != firma[2]
+        ]
+        for ruta in eliminados:
+            self._datos.pop(ruta, None)
+            self.errores.pop(ruta, None)
+
+        for ruta in modificados:
+            try:
+                self._datos[ruta] = cargar_archivo(ruta)
+                self.errores.pop(ruta, None)
+            except ErrorFuenteDatos as e:
+                self._datos.pop(ruta, None)
+                self.errores[ruta] = e
+        self._estado = estado
+        return modificados + eliminados
+
+    def archivos_validos(self, cargar_archivo=None):
+        """Actualiza y devuelve {ruta: datos} de los archivos válidos, ordenado por ruta."""
+        self.actualizar(cargar_archivo)
+        if not self._datos:
+            if self.errores:
+                raise next(iter(self.errores.values()))
+            raise ErrorFuenteDatos(
+                f"No se encontraron archivos '{self.patron}' en '{self.ruta}'.",
+                origen=self.origen, etapa="origen"
+            )
+        return {ruta: self._datos[ruta] for ruta in sorted(self._datos)}
+
+    def cargar(self):
+        """Actualiza y devuelve todos los archivos válidos concatenados en un DataFrame."""
+        return pd.concat(list(self.archivos_validos().values()), ignore_index=True)
+
+
+def _cargar_local(ruta):
+    return FuenteLocal(ruta).cargar()
+
+
+def _ruta_permitida(ruta, rutas_permitidas):
+    real = os.path.realpath(ruta)
+    for raiz in rutas_permitidas:
+        raiz = os.path.realpath(raiz)
+        if os.path.commonpath([real, raiz]) == raiz:
+            return True
+    return False
+
+
+def crear_fuente(entrada, rutas_permitidas=(), hosts_permitidos=()):
+    """Elige la fuente adecuada a partir de una URL o ruta introducida por el usuario.
+
+    Por defecto solo se aceptan enlaces de Google Drive. Las rutas locales
+    (archivo o carpeta) y las URLs HTTP genéricas solo se aceptan dentro de
+    `rutas_permitidas` / para `hosts_permitidos`, que vienen de la configuración
+    del servidor y no del usuario. Cualquier otra entrada se rechaza con el mismo
+    mensaje, sin revelar si la ruta existe.
+    """
+    entrada = entrada.strip()
+    if entrada.startswith(("http://", "https://")):
+        # Cualquier enlace con /d/<id> (Drive, Docs, Sheets) se descarga vía Drive, como antes
+        if re.search(FuenteGoogleDrive.patron, entrada):
+            return FuenteGoogleDrive(entrada)
+        host = (urlparse(entrada).hostname or "").lower()
+        if host and host in {h.lower() for h in hosts_permitidos}:
+            return FuenteHTTP(entrada)
+    elif entrada and _ruta_permitida(entrada, rutas_permitidas):
+        if os.path.isdir(entrada):
+            return FuenteDirectorio(entrada)
+        return FuenteLocal(entrada)
+    elif re.search(FuenteGoogleDrive.patron, entrada):
+        return FuenteGoogleDrive(entrada)
+    raise ErrorFuenteDatos(
+        "La URL proporcionada no es válida o no contiene un ID de archivo de Google Drive.",
+        origen=entrada, etapa="origen"
+    )
@@ -0,0 +1,175 @@
+"""Distribuciones de ritmos combinables.
+
+`DistribucionRitmos` guarda los conteos de ritmos sobre una rejilla fija
+(por defecto 1 segundo, la resolución de los ritmos mm:ss) junto con los
+momentos necesarios para el ajuste normal. Dos distribuciones con la misma
+resolución se combinan sumando conteos, así que una distribución de club se
+obtiene de los resúmenes por atleta (o por bloque de filas) sin concatenar las
+filas. Los conteos sirven a la vez de histograma fino y de sketch de cuantiles
+(error máximo: media resolución).
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+
+RESOLUCION_MIN = 1.0 / 60.0  # 1 segundo, en minutos
+MAX_BINS = 200
+
+
+class DistribucionRitmos:
+    def __init__(self, resolucion=RESOLUCION_MIN):
+        self.resolucion = resolucion
+        self._inicio = 0                       # índice de rejilla del primer conteo
+        self._conteos = np.zeros(0, dtype=np.int64)
+        self.n = 0
+        self._suma = 0.0
+        self._suma_cuadrados = 0.0
+
+    # =========================
+    # Construcción y combinación
+    # =========================
+    @classmethod
+    def combinar_todas(cls, distribuciones, resolucion=RESOLUCION_MIN):
+        total = cls(resolucion)
+        for dist in distribuciones:
+            total.combinar(dist)
+        return total
+
+    def agregar(self, valores):
+        """Añade ritmos en minutos (los NaN se ignoran)."""
+        valores = np.asarray(pd.Series(valores, dtype=float).dropna(), dtype=float)
+        if valores.size == 0:
+            return self
+        indices = np.rint(valores / self.resolucion).astype(np.int64)
+        inicio = int(indices.min())
+        conteos = np.bincount(indices - inicio)
+        self._sumar_conteos(inicio, conteos)
+        self.n += int(valores.size)
+        self._suma += float(valores.sum())
+        self._suma_cuadrados += float(np.square(valores).sum())
+        return self
+
+    def combinar(self, otra):
+        """Suma en esta distribución los conteos y momentos de `otra` (misma resolución)."""
+        if not math.isclose(otra.resolucion, self.resolucion):
+            raise ValueError("Solo se pueden combinar distribuciones con la misma resolución.")
+        if otra.n:
+            self._sumar_conteos(otra._inicio, otra._conteos)
+            self.n += otra.n
+            self._suma += otra._suma
+            self._suma_cuadrados += otra._suma_cuadrados
+        return self
+
+    def _sumar_conteos(self, inicio, conteos):
+        if self._conteos.size == 0:
+            self._inicio, self._conteos = inicio, conteos.astype(np.int64)
+            return
+        nuevo_inicio = min(self._inicio, inicio)
+        nuevo_fin = max(self._inicio + self._conteos.size, inicio + conteos.size)
+        total = np.zeros(nuevo_fin - nuevo_inicio, dtype=np.int64)
+        a = self._inicio - nuevo_inicio
+        total[a:a + self._conteos.size] += self._conteos
+        b = inicio - nuevo_inicio
+        total[b:b + conteos.size] += conteos
+        self._inicio, self._conteos = nuevo_inicio, total
+
+    # =========================
+    # Estadísticos
+    # =========================
+    @property
+    def media(self):
+        return self._suma / self.n if self.n else float("nan")
+
+    @property
+    def desviacion(self):
+        """Desviación típica poblacional (la misma que `scipy.stats.norm.fit`)."""
+        if not self.n:
+            return float("nan")
+        varianza = self._suma_cuadrados / self.n - self.media ** 2
+        return math.sqrt(max(varianza, 0.0))
+
+    @property
+    def minimo(self):
+        return self._valor(np.flatnonzero(self._conteos)[0]) if self.n else float("nan")
+
+    @property
+    def maximo(self):
+        return self._valor(np.flatnonzero(self._conteos)[-1]) if self.n else float("nan")
+
+    def _valor(self, posicion):
+        return (self._inicio + posicion) * self.resolucion
+
+    def cuantiles(self, qs):
+        """Cuantiles (q en [0, 1]) a partir de los conteos acumulados."""
+        if not self.n:
+            return [float("nan") for _ in qs]
+        acumulado = np.cumsum(self._conteos)
+        posiciones = np.searchsorted(acumulado, [max(q * self.n, 1) for q in qs])
+        return [self._valor(int(p)) for p in posiciones]
+
+    # =========================
+    # Histograma y densidad
+    # =========================
+    def ancho_bin(self, regla="fd"):
+        """Ancho de bin según Freedman-Diaconis ("fd") o Scott ("scott"), múltiplo de la resolución."""
+        if self.n < 2:
+            return self.resolucion
+        factor = self.n ** (-1.0 / 3.0)
+        q1, q3 = self.cuantiles([0.25, 0.75])
+        if regla == "fd" and q3 > q1:
+            ancho = 2.0 * (q3 - q1) * factor
+        else:
+            ancho = 3.49 * self.desviacion * factor
+        pasos = max(1, int(math.ceil(ancho / self.resolucion)))
+        # Evita histogramas con más bins de los que se pueden leer
+        pasos = max(pasos, int(math.ceil(self._conteos.size / MAX_BINS)))
+        return pasos * self.resolucion
+
+    def histograma(self, bins="fd"):
+        """Devuelve (conteos, bordes) como `np.histogram`.
+
+        `bins` puede ser un número de bins o una regla ("fd", "scott", "auto" = "fd").
+        Los bordes caen a media resolución de la rejilla, por lo que cada valor
+        queda dentro de un único bin.
+        """
+        if not self.n:
+            return np.zeros(0, dtype=np.int64), np.zeros(1)
+        if isinstance(bins, str):
+            pasos = int(round(self.ancho_bin("fd" if bins == "auto" else bins) / self.resolucion))
+        else:
+            pasos = max(1, int(math.ceil(self._conteos.size / int(bins))))
+        relleno = (-self._conteos.size) % pasos
+        conteos = np.concatenate([self._conteos, np.zeros(relleno, dtype=np.int64)])
+        hist = conteos.reshape(-1, pasos).sum(axis=1)
+        bordes = (self._inicio - 0.5 + pasos * np.arange(hist.size + 1)) * self.resolucion
+        return hist, bordes
+
+    def densidad_kde(self, ancho_banda=None, puntos=200):
+        """Estimación de densidad por kernel gaussiano sobre los conteos binned.
+
+        Convoluciona la rejilla fina con el kernel en lugar de evaluar cada
+        observación, así que el coste depende del rango y no del número de filas.
+        Devuelve (x, densidad).
+        """
+        if not self.n:
+            return np.zeros(0), np.zeros(0)
+        if ancho_banda is None:
+            # Regla de Silverman
+            q1, q3 = self.cuantiles([0.25, 0.75])
+            escala = min(self.desviacion, (q3 - q1) / 1.34) or self.desviacion
+            ancho_banda = 0.9 * escala * self.n ** (-0.2)
+        ancho_banda = max(ancho_banda, self.resolucion)
+
+        radio = int(math.ceil(4 * ancho_banda / self.resolucion))
+        offsets = np.arange(-radio, radio + 1) * self.resolucion
+        kernel = np.exp(-0.5 * (offsets / ancho_banda) ** 2)
+        kernel /= kernel.sum() * self.resolucion
+
+        conteos = np.concatenate([np.zeros(radio), self._conteos, np.zeros(radio)])
+        densidad = np.convolve(conteos, kernel, mode="same") / self.n
+        x_rejilla = (self._inicio - radio + np.arange(conteos.size)) * self.resolucion
+
+        x = np.linspace(x_rejilla[0], x_rejilla[-1], puntos)
+        return x, np.interp(x, x_rejilla, densidad)
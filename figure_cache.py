@@ -0,0 +1,107 @@
+"""Caché de figuras Bokeh serializadas.
+
+Construir y serializar (`file_html`) cada figura es la mayor parte del CPU de un
+rerun. Aquí se guarda el HTML ya serializado, con clave huella de los datos
+(`AgregadosEntrenamiento.huella`) + función de la pestaña + parámetros, y se
+reutiliza tanto en pantalla como en el reporte descargable. La caché es de
+proceso (compartida entre sesiones), con tamaño acotado y expulsión LRU.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+from bokeh.document import Document
+from bokeh.embed import file_html
+from bokeh.models import LayoutDOM
+from bokeh.resources import CDN
+
+
+MAX_ENTRADAS = 128
+MAX_BYTES = 128 * 1024 * 1024
+MARGEN_ALTO = 50  # px extra del iframe sobre la altura del gráfico
+
+# html: documento para mostrar en pantalla (iframe); html_reporte: fragmento para el reporte
+FiguraSerializada = namedtuple("FiguraSerializada", ["html", "alto", "html_reporte"])
+
+
+def _tamano(valor):
+    return sum(len(parte) for parte in (valor.html, valor.html_reporte))
+
+
+class CacheFiguras:
+    """LRU acotada por número de entradas y por bytes de HTML almacenado."""
+
+    def __init__(self, max_entradas=MAX_ENTRADAS, max_bytes=MAX_BYTES):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave, construir):
+        with self._lock:
+            valor = self._entradas.get(clave)
+            if valor is not None:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return valor
+            self.fallos += 1
+
+        # Se construye fuera del lock para no bloquear a otras sesiones
+        valor = construir()
+        if valor is None:
+            return None
+        tamano = _tamano(valor)
+        if tamano > self.max_bytes:
+            return valor
+
+        with self._lock:
+            if clave not in self._entradas:
+                self._entradas[clave] = valor
+                self._bytes += tamano
+            while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                _, expulsado = self._entradas.popitem(last=False)
+                self._bytes -= _tamano(expulsado)
+        return valor
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+cache_figuras = CacheFiguras()
+
+
+def _serializar(obj):
+    alto = (getattr(obj, "height", None) or 500) + MARGEN_ALTO
+    doc = Document()
+    doc.add_root(obj)
+    return file_html(doc, CDN, ""), alto
+
+
+def serializar_figura(df, huella, funcion, cache=cache_figuras, **params):
+    """Devuelve la `FiguraSerializada` de `funcion(df, **params)`, usando la caché si es posible.
+
+    Si la pestaña devuelve `(objeto_bokeh, html)` (tablas), el HTML se usa como
+    fragmento del reporte; en otro caso el reporte reutiliza el HTML de pantalla.
+    Devuelve None (sin guardarlo en caché) si la pestaña no produce un objeto Bokeh.
+    """
+    def construir():
+        resultado = funcion(df, **params)
+        html_reporte = None
+        if isinstance(resultado, tuple):
+            resultado, html_reporte = resultado
+        if not isinstance(resultado, LayoutDOM):
+            return None
+        html, alto = _serializar(resultado)
+        return FiguraSerializada(html, alto, html if html_reporte is None else html_reporte)
+
+    if cache is None:
+        return construir()
+    clave = (huella, funcion.__module__, funcion.__qualname__, tuple(sorted(params.items())))
+    return cache.obtener(clave, construir)
@@ -1,32 +1,49 @@
-import re
-import requests
-import pandas as pd
-from io import BytesIO
+import os
+
 import streamlit as st
 
-def leer_url_xlsx(url):
-    # Extrae el ID del archivo desde la URL de Google Drive
-    patron = r"/d/([a-zA-Z0-9_-]+)"
-    coincidencia = re.search(patron, url)
+from data_processing import mostrar_imagen_error
+from data_sources import ErrorFuenteDatos, crear_fuente
+from streaming import procesar_en_streaming
 
-    if coincidencia:
-        id_archivo = coincidencia.group(1)
-        # Construye URL de descarga directa
-        url_descarga = f"https://drive.google.com/uc?export=download&id={id_archivo}"
+def mostrar_error_fuente(e):
+    if e.etapa == "validacion":
+        st.error(f"⚠️ {e}")
+        st.info("ℹ️ Corrige el archivo en Excel según el formato esperado y vuelve a cargar en Google Drive o corrige el archivo directamente en Google Drive.")
+        mostrar_imagen_error("Referencia.png")
+    else:
+        st.error(f"❌ {e}")
 
-        try:
-            respuesta = requests.get(url_descarga)
-            respuesta.raise_for_status()  # Para errores HTTP
+def _lista_configurada(clave, variable_entorno, separador):
+    # Valor de st.secrets[clave] (lista) o de la variable de entorno (texto separado).
+    # Sin secrets.toml no se consulta st.secrets: Streamlit mostraría un st.error
+    valor = st.secrets.get(clave) if st.secrets.load_if_toml_exists() else None
+    if valor is None:
+        valor = os.environ.get(variable_entorno, "")
+    if isinstance(valor, str):
+        valor = valor.split(separador)
+    return tuple(v.strip() for v in valor if v and v.strip())
 
-            archivo_binario = BytesIO(respuesta.content)
-            df_inicial = pd.read_excel(archivo_binario, engine='openpyxl')
-            return df_inicial
+def configuracion_fuentes():
+    # Carpetas locales y hosts HTTP autorizados por el administrador (vacío = solo Google Drive)
+    return {
+        "rutas_permitidas": _lista_configurada("rutas_permitidas", "RENDIMIENTO_RUTAS_PERMITIDAS", os.pathsep),
+        "hosts_permitidos": _lista_configurada("hosts_permitidos", "RENDIMIENTO_HOSTS_PERMITIDOS", ","),
+    }
 
-        except Exception as e:
-            st.error(f"❌ Error al leer el archivo XLSX desde la URL: {e}")
-            st.stop()
-    else:
-        st.error("❌ La URL proporcionada no es válida o no contiene un ID de archivo de Google Drive.")
-        st.stop()
+def cargar_fuente(entrada, streaming=False, configuracion=None):
+    # Crea la fuente (Drive y, si están configurados, HTTP, archivo o carpeta local)
+    # y devuelve (fuente, datos limpios). `configuracion` es la de configuracion_fuentes().
+    # En modo streaming los datos son AgregadosEntrenamiento en lugar de un DataFrame.
+    if configuracion is None:
+        configuracion = configuracion_fuentes()
+    try:
+        fuente = crear_fuente(entrada, **configuracion)
+        if streaming:
+            return fuente, procesar_en_streaming(fuente)
+        return fuente, fuente.cargar()
 
+    except ErrorFuenteDatos as e:
+        mostrar_error_fuente(e)
+        st.stop()
 
@@ -1,13 +1,12 @@
 import streamlit as st
 import streamlit.components.v1 as components
-from bokeh.embed import file_html
-from bokeh.resources import CDN
-from bokeh.document import Document
-from bokeh.models import LayoutDOM
 import pandas as pd
 
-from file_io import leer_url_xlsx
-from data_processing import limpiar_datos
+from file_io import cargar_fuente, configuracion_fuentes, mostrar_error_fuente
+from data_sources import ErrorFuenteDatos, FuenteDirectorio
+from aggregates import MAX_FILAS_MUESTRA, como_agregados
+from figure_cache import serializar_figura
+from streaming import agregados_archivo, procesar_en_streaming
 from visualization import (
     tab_estadisticas,
     tab_histograma_ritmos,
@@ -21,41 +20,65 @@ from visualization import (
 st.set_page_config(page_title="Reporte de Rendimiento Deportivo", layout="wide")
 st.title("🏃‍♂️ Reporte de Rendimiento Deportivo")
 
-def mostrar_bokeh(obj, alto=600):
-    if obj is None:
-        return ""
-    if not isinstance(obj, LayoutDOM):
+def mostrar_bokeh(df, funcion, alto=None, **params):
+    # Figura serializada desde la caché (mismo HTML para pantalla y reporte)
+    figura = serializar_figura(df, st.session_state.huella, funcion, **params)
+    if figura is None:
         st.error("Objeto no es gráfico Bokeh válido")
         return ""
-    doc = Document()
-    doc.add_root(obj)
-    html = file_html(doc, CDN, "Bokeh objeto")
-    components.html(html, height=alto, scrolling=True)
-    return html
+    components.html(figura.html, height=alto or figura.alto, scrolling=True)
+    return figura.html_reporte
 
-for key in ["datos_cargados", "df", "nombre", "club"]:
+for key in ["datos_cargados", "streaming", "df", "fuente", "huella", "nombre", "club"]:
     if key not in st.session_state:
-        st.session_state[key] = False if key == "datos_cargados" else (None if key == "df" else "")
+        st.session_state[key] = False if key in ("datos_cargados", "streaming") else (None if key in ("df", "fuente") else "")
 
 if not st.session_state.datos_cargados:
+    # Rutas y hosts autorizados: se leen una vez por rerun
+    fuentes_autorizadas = configuracion_fuentes()
     with st.form("formulario_datos"):
-        URL = st.text_input("📂 Ingresa la URL del archivo XLSX en Google Drive:")
+        etiqueta_url = "📂 Ingresa la URL del archivo XLSX en Google Drive:"
+        if any(fuentes_autorizadas.values()):
+            etiqueta_url = "📂 Ingresa la URL del archivo XLSX en Google Drive (o una ruta/URL autorizada):"
+        URL = st.text_input(etiqueta_url)
         nombre = st.text_input("👤 Nombre y Apellidos:")
         club = st.text_input("🏅 Club:")
+        streaming = st.checkbox("⚡ Modo streaming (registros muy grandes, se procesan por bloques)")
         enviado = st.form_submit_button("Cargar datos")
         if enviado and URL and nombre and club:
-            df_ = leer_url_xlsx(URL)
+            fuente, df_ = cargar_fuente(URL, streaming=streaming, configuracion=fuentes_autorizadas) or (None, None)
             if df_ is None:
-                st.error("❌ No se pudo obtener el archivo desde Google Drive.")
+                st.error("❌ No se pudo obtener el archivo desde la fuente indicada.")
             elif df_.empty:
                 st.warning("⚠️ El archivo está vacío o no tiene registros.")
             else:
-                st.session_state.df = limpiar_datos(df_)
+                # Las pestañas leen los agregados: se calculan una vez por carga
+                st.session_state.df = como_agregados(df_)
+                st.session_state.huella = st.session_state.df.huella
+                st.session_state.fuente = fuente
+                st.session_state.streaming = streaming
                 st.session_state.nombre = nombre
                 st.session_state.club = club
                 st.session_state.datos_cargados = True
                 st.success("Datos cargados. Ver reporte debajo.")
 
+# Carpeta vigilada: en cada rerun se recargan solo los archivos modificados
+# (en modo streaming, sus agregados; el total se combina con los del resto)
+if st.session_state.datos_cargados and isinstance(st.session_state.fuente, FuenteDirectorio):
+    fuente = st.session_state.fuente
+    try:
+        cargar_archivo = agregados_archivo if st.session_state.streaming else None
+        if fuente.actualizar(cargar_archivo):
+            st.session_state.df = como_agregados(
+                procesar_en_streaming(fuente) if st.session_state.streaming else fuente.cargar()
+            )
+            st.session_state.huella = st.session_state.df.huella
+    except ErrorFuenteDatos as e:
+        mostrar_error_fuente(e)
+    # Archivos omitidos por no ser válidos (el resto del reporte sí se muestra)
+    for e in fuente.errores.values():
+        st.warning(f"⚠️ Archivo omitido ({e.origen}): {e}")
+
 if st.session_state.datos_cargados and st.session_state.df is not None:
     df = st.session_state.df
     nombre = st.session_state.nombre
@@ -140,10 +163,9 @@ if st.session_state.datos_cargados and st.session_state.df is not None:
         "Muestra cómo ha evolucionado el ritmo promedio de las sesiones "
         "a lo largo del tiempo. Permite identificar mejoras, tendencias y variaciones en el desempeño. "
         )
-        medio = tab_ritmo_medio_fecha(df)
-        st.bokeh_chart(medio, use_container_width=True)
+        medio = mostrar_bokeh(df, tab_ritmo_medio_fecha)
         report_html += "<h2>Ritmo Medio por Fecha</h2>"
-        report_html += file_html(medio, CDN, "")
+        report_html += medio
         report_html += "<div style='margin:40px 0;'></div>"
 
 
@@ -154,10 +176,19 @@ if st.session_state.datos_cargados and st.session_state.df is not None:
         "Muestra la distribución de los ritmos de entrenamiento registrados. "
         "Permite visualizar con qué frecuencia se presentan diferentes rangos de ritmo. "
         )
-        hist = tab_histograma_ritmos(df)
-        st.bokeh_chart(hist, use_container_width=True)
+        curva = st.radio(
+            "Curva superpuesta",
+            ["Normal", "Densidad (KDE)"],
+            horizontal=True,
+            key="curva_histograma"
+        )
+        params_hist = {
+            "percentiles": (25, 50, 75),
+            "superposicion": "kde" if curva == "Densidad (KDE)" else "normal"
+        }
+        hist = mostrar_bokeh(df, tab_histograma_ritmos, **params_hist)
         report_html += "<h2>Histograma de Ritmos</h2>"
-        report_html += file_html(hist, CDN, "")
+        report_html += hist
         report_html += "<div style='margin:40px 0;'></div>"
 
 
@@ -167,10 +198,9 @@ if st.session_state.datos_cargados and st.session_state.df is not None:
         st.markdown(
         "Muestra las mejores sesiones de entrenamiento evaluadas por ritmo. "
         )
-        mejores = tab_mejores_sesiones_ritmo_distancia(df)
-        st.bokeh_chart(mejores, use_container_width=True)
+        mejores = mostrar_bokeh(df, tab_mejores_sesiones_ritmo_distancia)
         report_html += "<h2>Mejores Sesiones</h2>"
-        report_html += file_html(mejores, CDN, "")
+        report_html += mejores
         report_html += "<div style='margin:40px 0;'></div>"
 
 
@@ -180,11 +210,7 @@ if st.session_state.datos_cargados and st.session_state.df is not None:
         st.markdown(
         "Muestra el rendimiento de las sesiones en cada día."
         )
-        tabla_obj, tabla_html = tab_tabla_por_fecha(df)
-        if isinstance(tabla_obj, LayoutDOM):
-            mostrar_bokeh(tabla_obj, alto=600)
-        else:
-            st.write(tabla_obj)
+        tabla_html = mostrar_bokeh(df, tab_tabla_por_fecha, alto=600)
         report_html += f"<h2>Resumen por Fecha</h2>{tabla_html}"
         report_html += "<div style='margin:40px 0;'></div>"
 
@@ -196,20 +222,17 @@ if st.session_state.datos_cargados and st.session_state.df is not None:
         "Muestra la cantidad total de kilómetros acumulados en cada lugar de entrenamiento, "
         "desglosados por periodos definidos."
         )
-        barras = tab_barras_lugares(df)
-        st.bokeh_chart(barras, use_container_width=True)
+        barras = mostrar_bokeh(df, tab_barras_lugares)
         report_html += "<h2>Lugares de Entrenamiento</h2>"
-        report_html += file_html(barras, CDN, "")
+        report_html += barras
         report_html += "<div style='margin:40px 0;'></div>"
 
 
     # Datos Completos
     with tab7:
-        data_completo = tab_data_completo(df)
-        if isinstance(data_completo, LayoutDOM):
-            mostrar_bokeh(data_completo, alto=600)
-        else:
-            st.write(data_completo)
+        if st.session_state.streaming:
+            st.caption(f"Modo streaming: se muestran las primeras {MAX_FILAS_MUESTRA} filas.")
+        mostrar_bokeh(df, tab_data_completo, alto=600)
         # Opcional: Para agregar tabla completa al HTML descargado descomentar esto:
         # if isinstance(data_completo, pd.DataFrame):
         #     report_html += "<h2>📋 Datos Completos</h2>" + data_completo.to_html(border=1, index=False)
@@ -0,0 +1,336 @@
+"""Prueba de carga de sesiones concurrentes sin navegador.
+
+Levanta un servidor HTTP local que imita el endpoint ``uc?export=download`` de
+Google Drive y recorre N sesiones simuladas por el flujo completo de la app:
+descarga con la sesión HTTP compartida (``FuenteGoogleDrive``, como
+``cargar_fuente``), lectura del XLSX, limpieza (``normalizar_datos`` y
+``como_agregados``) y render de las siete pestañas con su serialización a HTML,
+igual que ``main.py``. Cada worker es un proceso propio, como un proceso de
+Streamlit.
+
+Uso:
+    python prueba_carga.py --sesiones 200 --concurrencia 8 --workers 2 \\
+        --filas 500 5000 --latencia 150
+"""
+import argparse
+import multiprocessing
+import queue
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+from aggregates import como_agregados
+from data_processing import normalizar_datos
+from data_sources import ErrorFuenteDatos, FuenteGoogleDrive, leer_xlsx
+from streaming import procesar_en_streaming
+from figure_cache import cache_figuras, serializar_figura
+from visualization import (
+    tab_estadisticas,
+    tab_histograma_ritmos,
+    tab_mejores_sesiones_ritmo_distancia,
+    tab_ritmo_medio_fecha,
+    tab_tabla_por_fecha,
+    tab_barras_lugares,
+    tab_data_completo
+)
+
+
+FASES = ["descarga", "lectura", "limpieza", "render", "total"]
+# En modo streaming la descarga, la lectura y la limpieza por bloques van en una sola fase
+FASES_STREAMING = ["carga", "render", "total"]
+TIMEOUT_ARRANQUE = 120  # segundos para que todos los workers terminen de importar
+
+
+# =========================
+# Generación de archivos XLSX sintéticos
+# =========================
+def generar_xlsx(filas, semilla=0):
+    """Genera un XLSX con el formato esperado (6 columnas) y `filas` registros."""
+    rng = np.random.default_rng(semilla)
+    lugares = ["Pista", "Parque", "Montaña", "Playa", "Ciudad", "Cinta"]
+    periodos = ["Base", "Específico", "Competitivo", "Transición"]
+
+    # Cada sesión se registra km a km: Distancia_km va de 1 a la longitud de la sesión
+    distancias, fechas, lugar_col, periodo_col = [], [], [], []
+    fecha = pd.Timestamp("2024-01-01")
+    while len(distancias) < filas:
+        largo = int(rng.integers(3, 21))
+        lugar = lugares[int(rng.integers(len(lugares)))]
+        periodo = periodos[(fecha.month - 1) // 3]
+        for km in range(1, largo + 1):
+            distancias.append(km)
+            fechas.append(fecha.strftime("%d/%m/%Y"))
+            lugar_col.append(lugar)
+            periodo_col.append(periodo)
+        fecha += pd.Timedelta(days=1)
+
+    segundos = rng.normal(300, 25, size=filas).clip(180, 540).astype(int)
+    df = pd.DataFrame({
+        "ID": np.arange(1, filas + 1),
+        "Lugar": lugar_col[:filas],
+        "Fecha": fechas[:filas],
+        "Distancia_km": distancias[:filas],
+        "Ritmos": [f"{s // 60:02d}:{s % 60:02d}" for s in segundos],
+        "Periodo": periodo_col[:filas],
+    })
+
+    buffer = BytesIO()
+    df.to_excel(buffer, index=False, engine="openpyxl")
+    return buffer.getvalue()
+
+
+# =========================
+# Servidor local que imita Google Drive
+# =========================
+class ServidorDrive:
+    """Servidor HTTP en segundo plano que sirve `/uc?export=download&id=<id>`.
+
+    `archivos` asocia cada id con el contenido binario del XLSX; `latencia`
+    (segundos) se añade antes de cada respuesta para simular la red.
+    """
+
+    def __init__(self, archivos, latencia=0.0, host="127.0.0.1", puerto=0):
+        self.archivos = archivos
+        self.latencia = latencia
+        servidor = self
+
+        class _Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                consulta = urlparse(self.path)
+                id_archivo = parse_qs(consulta.query).get("id", [""])[0]
+                if servidor.latencia:
+                    time.sleep(servidor.latencia)
+                contenido = servidor.archivos.get(id_archivo)
+                if consulta.path != "/uc" or contenido is None:
+                    self.send_error(404, "Archivo no encontrado")
+                    return
+                self.send_response(200)
+                self.send_header(
+                    "Content-Type",
+                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+                self.send_header("Content-Length", str(len(contenido)))
+                self.end_headers()
+                self.wfile.write(contenido)
+
+            def log_message(self, *args):
+                pass
+
+        self._http = ThreadingHTTPServer((host, puerto), _Manejador)
+        self._http.daemon_threads = True
+        self._hilo = threading.Thread(target=self._http.serve_forever, daemon=True)
+
+    @property
+    def url_descarga(self):
+        host, puerto = self._http.server_address[:2]
+        return f"http://{host}:{puerto}/uc?export=download&id={{id_archivo}}"
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._http.shutdown()
+        self._http.server_close()
+
+
+# =========================
+# Sesión simulada
+# =========================
+def _render_reporte(df, nombre, club, cache=cache_figuras):
+    """Reproduce el render de las pestañas de `main.py` y devuelve el HTML del reporte."""
+    report_html = "<html><body>"
+    report_html += tab_estadisticas(df, nombre, club)
+
+    # Como en main.py, la huella se calcula una vez por carga de datos
+    huella = df.huella
+    for tab in (tab_ritmo_medio_fecha, tab_histograma_ritmos,
+                tab_mejores_sesiones_ritmo_distancia, tab_tabla_por_fecha,
+                tab_barras_lugares, tab_data_completo):
+        figura = serializar_figura(df, huella, tab, cache=cache)
+        if tab is not tab_data_completo:
+            report_html += figura.html_reporte
+
+    return report_html + "</body></html>"
+
+
+def sesion_simulada(id_archivo, url_descarga, usar_cache=True, streaming=False):
+    """Ejecuta una sesión completa y devuelve los tiempos (s) de cada fase, o None si falla.
+
+    Las fases son las de `FASES`, o las de `FASES_STREAMING` en modo streaming.
+    """
+    url = f"https://drive.google.com/file/d/{id_archivo}/view"
+    fuente = FuenteGoogleDrive(url, url_descarga=url_descarga)
+    tiempos = {}
+    t0 = time.perf_counter()
+    if streaming:
+        try:
+            df = procesar_en_streaming(fuente)
+        except ErrorFuenteDatos:
+            return None
+        if df.empty:
+            return None
+        tiempos["carga"] = time.perf_counter() - t0
+    else:
+        # Mismo camino que cargar_fuente -> FuenteGoogleDrive.cargar, separado en fases
+        try:
+            contenido = fuente.leer_bytes()
+            t1 = time.perf_counter()
+            df_ = leer_xlsx(contenido, fuente.origen)
+            t2 = time.perf_counter()
+            if df_.empty:
+                return None
+            # Como main.py, los agregados de las pestañas se calculan una vez por carga
+            df = como_agregados(normalizar_datos(df_))
+        except (ErrorFuenteDatos, ValueError):
+            return None
+        tiempos.update(descarga=t1 - t0, lectura=t2 - t1, limpieza=time.perf_counter() - t2)
+    t_render = time.perf_counter()
+    _render_reporte(df, "Atleta de prueba", "Club de prueba",
+                    cache=cache_figuras if usar_cache else None)
+    fin = time.perf_counter()
+    tiempos.update(render=fin - t_render, total=fin - t0)
+    return tiempos
+
+
+def _ejecutar_worker(indice, lote, barrera, cola):
+    """Corre las sesiones de `lote` en este proceso (un worker de Streamlit) con un pool de hilos.
+
+    Espera en `barrera` a que todos los workers estén listos y deja en `cola`
+    (indice, resultados, RSS máximo en MB).
+    """
+    ids_archivo, url_descarga, concurrencia, usar_cache, streaming = lote
+    barrera.wait()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        resultados = list(pool.map(
+            lambda i: sesion_simulada(i, url_descarga, usar_cache=usar_cache, streaming=streaming),
+            ids_archivo
+        ))
+    # ru_maxrss se expresa en KiB en Linux
+    rss_max_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    cola.put((indice, resultados, rss_max_mb))
+
+
+def _ejecutar_workers(lotes):
+    """Lanza un proceso "spawn" por lote y devuelve ([(resultados, rss)], duración en s).
+
+    Un proceso por lote (también si hay uno solo): ninguno corre dos lotes, y su
+    RSS no incluye el servidor ni los XLSX generados aquí. La duración se mide
+    desde que todos terminaron de arrancar.
+    """
+    contexto = multiprocessing.get_context("spawn")
+    barrera = contexto.Barrier(len(lotes) + 1)
+    cola = contexto.Queue()
+    procesos = [
+        contexto.Process(target=_ejecutar_worker, args=(i, lote, barrera, cola), daemon=True)
+        for i, lote in enumerate(lotes)
+    ]
+    try:
+        for proceso in procesos:
+            proceso.start()
+        barrera.wait(timeout=TIMEOUT_ARRANQUE)
+        inicio = time.perf_counter()
+        salidas = {}
+        while len(salidas) < len(procesos):
+            try:
+                indice, resultados, rss_max_mb = cola.get(timeout=1.0)
+            except queue.Empty:
+                if any(p.exitcode not in (None, 0) for p in procesos):
+                    raise RuntimeError("Un worker de la prueba de carga terminó con error.")
+                continue
+            salidas[indice] = (resultados, rss_max_mb)
+        duracion = time.perf_counter() - inicio
+        for proceso in procesos:
+            proceso.join()
+    finally:
+        for proceso in procesos:
+            if proceso.is_alive():
+                proceso.terminate()
+    return [salidas[i] for i in range(len(lotes))], duracion
+
+
+# =========================
+# Ejecución y reporte
+# =========================
+def ejecutar_prueba(sesiones=50, concurrencia=4, workers=1, filas=(1000,), latencia=0.0,
+                    usar_cache=True, streaming=False):
+    """Lanza la prueba de carga y devuelve un diccionario con las métricas agregadas."""
+    # Un archivo distinto por sesión (semilla = índice), como usuarios con datos propios:
+    # así la caché de figuras no acierta más de lo que acertaría con tráfico real
+    archivos = {
+        f"sesion_{i}": generar_xlsx(filas[i % len(filas)], semilla=i) for i in range(sesiones)
+    }
+    asignacion = list(archivos)
+
+    with ServidorDrive(archivos, latencia=latencia) as servidor:
+        lotes = [
+            (asignacion[w::workers], servidor.url_descarga, concurrencia, usar_cache, streaming)
+            for w in range(workers)
+        ]
+        salidas, duracion = _ejecutar_workers(lotes)
+
+    tiempos = [r for resultados, _ in salidas for r in resultados if r is not None]
+    metricas = {
+        "sesiones": sesiones,
+        "errores": sesiones - len(tiempos),
+        "duracion_s": duracion,
+        "throughput_sesiones_s": len(tiempos) / duracion if duracion else 0.0,
+        "memoria_worker_mb": [rss for _, rss in salidas],
+        "latencias_s": {},
+    }
+    for fase in FASES_STREAMING if streaming else FASES:
+        valores = np.array([t[fase] for t in tiempos])
+        if valores.size:
+            p50, p95, p99 = np.percentile(valores, [50, 95, 99])
+        else:
+            p50 = p95 = p99 = float("nan")
+        metricas["latencias_s"][fase] = {"p50": p50, "p95": p95, "p99": p99}
+    return metricas
+
+
+def imprimir_reporte(metricas):
+    print(f"Sesiones: {metricas['sesiones']}  Errores: {metricas['errores']}  "
+          f"Duración: {metricas['duracion_s']:.2f} s")
+    print(f"Throughput: {metricas['throughput_sesiones_s']:.2f} sesiones/s")
+    print(f"{'Fase':<10}{'p50 (ms)':>12}{'p95 (ms)':>12}{'p99 (ms)':>12}")
+    for fase, p in metricas["latencias_s"].items():
+        print(f"{fase:<10}{p['p50'] * 1000:>12.1f}{p['p95'] * 1000:>12.1f}{p['p99'] * 1000:>12.1f}")
+    for i, rss in enumerate(metricas["memoria_worker_mb"]):
+        print(f"Worker {i}: memoria máxima (RSS) {rss:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del flujo de carga y render del reporte.")
+    parser.add_argument("--sesiones", type=int, default=50, help="Número total de sesiones simuladas")
+    parser.add_argument("--concurrencia", type=int, default=4, help="Sesiones simultáneas por worker")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos worker independientes")
+    parser.add_argument("--filas", type=int, nargs="+", default=[1000],
+                        help="Tamaños (filas) de los archivos; cada sesión recibe uno propio, por turnos")
+    parser.add_argument("--latencia", type=float, default=0.0,
+                        help="Latencia añadida por el servidor en milisegundos")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="Serializa todas las figuras en cada sesión, sin la caché de figuras")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Procesa los archivos por bloques (modo streaming) en lugar de en memoria")
+    args = parser.parse_args()
+
+    metricas = ejecutar_prueba(
+        sesiones=args.sesiones,
+        concurrencia=args.concurrencia,
+        workers=args.workers,
+        filas=tuple(args.filas),
+        latencia=args.latencia / 1000.0,
+        usar_cache=not args.sin_cache,
+        streaming=args.streaming,
+    )
+    imprimir_reporte(metricas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Modo streaming para registros de entrenamiento muy grandes.
+
+El XLSX se lee por bloques de filas (openpyxl en modo read_only), cada bloque
+pasa por `normalizar_datos` y alimenta `AgregadosEntrenamiento`: acumulados por
+sesión (Fecha), por Lugar/Periodo, la distribución de ritmos y los destacados.
+Ningún paso conserva todas las filas, así que la memoria máxima depende del
+tamaño del bloque y del número de sesiones, no del tamaño del archivo.
+"""
+import pandas as pd
+from openpyxl import load_workbook
+
+from aggregates import AgregadosEntrenamiento
+from data_processing import normalizar_datos
+from data_sources import ErrorFuenteDatos, FuenteDirectorio, FuenteLocal
+
+
+TAM_BLOQUE_FILAS = 5000
+
+
+# =========================
+# Lectura por bloques
+# =========================
+def _recortar(fila):
+    """Fila sin las celdas vacías del final, como hace `read_excel` (celdas con formato)."""
+    fila = [None if v == "" else v for v in fila]
+    while fila and fila[-1] is None:
+        fila.pop()
+    return fila
+
+
+def _filas_con_datos(filas):
+    """Genera (índice, fila recortada). Las filas vacías solo se descartan al final de la hoja."""
+    primera_vacia = None
+    for i, fila in enumerate(filas):
+        fila = _recortar(fila)
+        if not fila:
+            if primera_vacia is None:
+                primera_vacia = i
+            continue
+        if primera_vacia is not None:
+            # Filas vacías entre datos: read_excel las conserva (y la validación las rechaza)
+            for j in range(primera_vacia, i):
+                yield j, []
+            primera_vacia = None
+        yield i, fila
+
+
+def _crear_bloque(filas, indices, ancho):
+    filas = [fila + [None] * (ancho - len(fila)) for fila in filas]
+    return pd.DataFrame(filas, columns=list(range(ancho)), index=indices)
+
+
+def leer_bloques_xlsx(archivo, tam_bloque=TAM_BLOQUE_FILAS, origen=""):
+    """Genera DataFrames crudos de hasta `tam_bloque` filas.
+
+    Se leen igual que con `read_excel`: el índice de cada bloque es la fila de
+    Excel menos 2, para que los mensajes de `normalizar_datos` indiquen la fila
+    correcta, y el número de columnas es el de la fila más ancha leída hasta el
+    momento, sin contar las celdas vacías del final.
+    """
+    if hasattr(archivo, "seek"):
+        archivo.seek(0)
+    try:
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+    except Exception as e:
+        raise ErrorFuenteDatos(
+            f"No se pudo leer el archivo XLSX ({origen}): {e}",
+            origen=origen, etapa="lectura", causa=e
+        )
+    try:
+        # Primera hoja, como read_excel (sheet_name=0), no la activa al guardar
+        hoja = libro.worksheets[0]
+        hoja.reset_dimensions()  # las dimensiones guardadas en el archivo pueden no ser fiables
+        filas = hoja.iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if encabezado is None:
+            return
+        ancho = len(_recortar(encabezado))
+        bloque, indices = [], []
+        for i, fila in _filas_con_datos(filas):
+            ancho = max(ancho, len(fila))
+            bloque.append(fila)
+            indices.append(i)
+            if len(bloque) >= tam_bloque:
+                yield _crear_bloque(bloque, indices, ancho)
+                bloque, indices = [], []
+        if bloque:
+            yield _crear_bloque(bloque, indices, ancho)
+    finally:
+        libro.close()
+
+
+def bloques_limpios(archivo, tam_bloque=TAM_BLOQUE_FILAS, origen=""):
+    """Como `leer_bloques_xlsx`, pero con cada bloque validado y limpio."""
+    for bloque in leer_bloques_xlsx(archivo, tam_bloque, origen):
+        try:
+            yield normalizar_datos(bloque)
+        except ValueError as e:
+            raise ErrorFuenteDatos(str(e), origen=origen, etapa="validacion", causa=e)
+
+
+# =========================
+# Pipeline
+# =========================
+def _recoger_filas_mejores(agregados, archivo, fechas, tam_bloque, origen):
+    """Segunda pasada: conserva todas las filas del archivo de las sesiones en `fechas`."""
+    # Cada bloque se limpia igual que en la primera pasada (p. ej. las filas con
+    # Distancia_km <= 0 se descartan antes de validar la fecha)
+    filas = [
+        bloque[bloque["Fecha"].isin(fechas)]
+        for bloque in bloques_limpios(archivo, tam_bloque, origen)
+    ]
+    agregados.agregar_filas_mejores(pd.concat(filas), fechas)
+
+
+def _procesar_archivo(fuente, tam_bloque):
+    # Las dos pasadas se hacen sobre el mismo archivo (local o temporal)
+    agregados = AgregadosEntrenamiento()
+    with fuente.abrir_archivo() as archivo:
+        for bloque in bloques_limpios(archivo, tam_bloque, fuente.origen):
+            agregados.agregar(bloque, fuente.origen)
+        if not agregados.empty:
+            _recoger_filas_mejores(
+                agregados, archivo, agregados.fechas_mejores_sesiones(), tam_bloque, fuente.origen
+            )
+    return agregados
+
+
+def agregados_archivo(ruta, tam_bloque=TAM_BLOQUE_FILAS):
+    """`AgregadosEntrenamiento` de un XLSX local (`cargar_archivo` de `FuenteDirectorio`)."""
+    return _procesar_archivo(FuenteLocal(ruta), tam_bloque)
+
+
+def _combinar(parciales):
+    agregados = AgregadosEntrenamiento()
+    for parcial in parciales:
+        agregados.combinar(parcial)
+    return agregados
+
+
+def _procesar_directorio(fuente, tam_bloque):
+    parciales = fuente.archivos_validos(lambda ruta: agregados_archivo(ruta, tam_bloque))
+    agregados = _combinar(parciales.values())
+
+    # Cada archivo conserva las filas de sus mejores sesiones. Si una sesión (Fecha)
+    # está repartida entre archivos, puede estar entre las mejores del total sin
+    # estarlo en un archivo: solo entonces se vuelve a leer ese archivo
+    fechas = agregados.fechas_mejores_sesiones()
+    completados = False
+    for ruta, parcial in parciales.items():
+        faltan = parcial.fechas_sin_filas(fechas)
+        if faltan:
+            with FuenteLocal(ruta).abrir_archivo() as archivo:
+                _recoger_filas_mejores(parcial, archivo, faltan, tam_bloque, ruta)
+            completados = True
+    return _combinar(parciales.values()) if completados else agregados
+
+
+def procesar_en_streaming(fuente, tam_bloque=TAM_BLOQUE_FILAS):
+    """Recorre la fuente por bloques y devuelve sus `AgregadosEntrenamiento`.
+
+    Se hacen dos pasadas sobre cada archivo: la primera acumula los agregados y
+    la segunda recoge solo las filas de las mejores sesiones, que el gráfico de
+    "Mejores Sesiones" dibuja km a km.
+
+    En un directorio, los agregados de cada archivo se guardan en la fuente
+    (`FuenteDirectorio.archivos_validos`): solo se procesan los archivos nuevos o
+    modificados, los inválidos se omiten y quedan en `fuente.errores`, y el total
+    se obtiene combinando los agregados de todos.
+    """
+    if isinstance(fuente, FuenteDirectorio):
+        return _procesar_directorio(fuente, tam_bloque)
+    return _procesar_archivo(fuente, tam_bloque)
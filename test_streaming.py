@@ -0,0 +1,168 @@
+"""Comprueba que el modo streaming da el mismo reporte que la carga normal."""
+import os
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from aggregates import como_agregados
+import streaming
+from data_sources import ErrorFuenteDatos, FuenteDirectorio, FuenteLocal
+from streaming import procesar_en_streaming
+from visualization import (
+    tab_estadisticas,
+    tab_mejores_sesiones_ritmo_distancia,
+    tab_tabla_por_fecha,
+)
+
+
+ENCABEZADO = ["ID", "Lugar", "Fecha", "Distancia_km", "Ritmos", "Periodo"]
+
+
+def escribir_xlsx(ruta, filas, celdas_con_formato=()):
+    libro = Workbook()
+    hoja = libro.active
+    hoja.append(ENCABEZADO)
+    for fila in filas:
+        hoja.append(list(fila))
+    # Celdas vacías pero con formato: openpyxl las reporta, read_excel las ignora
+    for celda in celdas_con_formato:
+        hoja[celda].number_format = "0.00"
+    libro.save(ruta)
+    return str(ruta)
+
+
+def filas_sesiones(n_sesiones=8, desfase=0):
+    filas = []
+    for dia in range(1, n_sesiones + 1):
+        for km in range(1, dia % 4 + 3):
+            segundos = 270 + (dia * 7 + km * 3 + desfase) % 60
+            filas.append((len(filas) + 1, "Pista" if dia % 2 else "Parque", f"{dia:02d}/03/2024",
+                          km, f"{segundos // 60:02d}:{segundos % 60:02d}", "Base"))
+    return filas
+
+
+def cargar_ambos_modos(ruta, tam_bloque=3):
+    normal = como_agregados(FuenteLocal(ruta).cargar())
+    streaming = procesar_en_streaming(FuenteLocal(ruta), tam_bloque=tam_bloque)
+    return normal, streaming
+
+
+def leyendas(agregados):
+    return [item.label["value"] for item in tab_mejores_sesiones_ritmo_distancia(agregados).legend[0].items]
+
+
+def assert_mismo_reporte(normal, streaming):
+    assert tab_estadisticas(streaming, "Atleta", "Club") == tab_estadisticas(normal, "Atleta", "Club")
+    assert tab_tabla_por_fecha(streaming)[1] == tab_tabla_por_fecha(normal)[1]
+    assert leyendas(streaming) == leyendas(normal)
+    # El gráfico ordena cada sesión por km: basta con las mismas filas por Fecha
+    pd.testing.assert_frame_equal(*(
+        agregados.filas_mejores_sesiones().sort_values("Fecha", kind="stable").reset_index(drop=True)
+        for agregados in (streaming, normal)
+    ))
+
+
+def test_mismo_reporte_con_varios_bloques(tmp_path):
+    ruta = escribir_xlsx(tmp_path / "registro.xlsx", filas_sesiones())
+    assert_mismo_reporte(*cargar_ambos_modos(ruta))
+
+
+def test_filas_descartadas_no_validan_la_fecha(tmp_path):
+    # Distancia_km = 0 se descarta antes de validar la fecha, también en la segunda pasada
+    filas = filas_sesiones()
+    filas.insert(4, (99, "Pista", "sin fecha", 0, "05:00", "Base"))
+    ruta = escribir_xlsx(tmp_path / "registro.xlsx", filas)
+    assert_mismo_reporte(*cargar_ambos_modos(ruta))
+
+
+def test_fecha_invalida_es_error_de_validacion(tmp_path):
+    filas = filas_sesiones()
+    filas.insert(4, (99, "Pista", "sin fecha", 2, "05:00", "Base"))
+    ruta = escribir_xlsx(tmp_path / "registro.xlsx", filas)
+    with pytest.raises(ErrorFuenteDatos) as normal:
+        FuenteLocal(ruta).cargar()
+    with pytest.raises(ErrorFuenteDatos) as streaming:
+        procesar_en_streaming(FuenteLocal(ruta), tam_bloque=3)
+    assert streaming.value.etapa == normal.value.etapa == "validacion"
+    assert str(streaming.value) == str(normal.value)
+
+
+def test_celdas_vacias_con_formato_no_cuentan_como_columnas(tmp_path):
+    ruta = escribir_xlsx(tmp_path / "registro.xlsx", filas_sesiones(), celdas_con_formato=["H1", "H5", "J40"])
+    assert_mismo_reporte(*cargar_ambos_modos(ruta))
+
+
+def test_filas_vacias_al_final_se_ignoran(tmp_path):
+    filas = filas_sesiones() + [(None,) * 6] * 3
+    ruta = escribir_xlsx(tmp_path / "registro.xlsx", filas, celdas_con_formato=["A60"])
+    assert_mismo_reporte(*cargar_ambos_modos(ruta))
+
+
+def test_fila_vacia_entre_datos_es_error_en_ambos_modos(tmp_path):
+    filas = filas_sesiones()
+    filas.insert(6, (None,) * 6)
+    ruta = escribir_xlsx(tmp_path / "registro.xlsx", filas)
+    with pytest.raises(ErrorFuenteDatos) as normal:
+        FuenteLocal(ruta).cargar()
+    with pytest.raises(ErrorFuenteDatos) as streaming:
+        procesar_en_streaming(FuenteLocal(ruta), tam_bloque=3)
+    assert streaming.value.etapa == normal.value.etapa == "validacion"
+    assert str(streaming.value) == str(normal.value)
+
+
+def crear_directorio(ruta):
+    ruta.mkdir()
+    # Mismas fechas en los dos primeros archivos: sesiones repartidas entre archivos
+    escribir_xlsx(ruta / "a.xlsx", filas_sesiones(8))
+    escribir_xlsx(ruta / "b.xlsx", filas_sesiones(8, desfase=31))
+    escribir_xlsx(ruta / "c.xlsx", filas_sesiones(12, desfase=13)[-10:])
+    return str(ruta)
+
+
+def contar_archivos_procesados(monkeypatch):
+    procesados = []
+    original = streaming.agregados_archivo
+
+    def contar(ruta, *args, **kwargs):
+        procesados.append(os.path.basename(ruta))
+        return original(ruta, *args, **kwargs)
+
+    monkeypatch.setattr(streaming, "agregados_archivo", contar)
+    return procesados
+
+
+def test_directorio_mismo_reporte_que_modo_normal(tmp_path):
+    ruta = crear_directorio(tmp_path / "club")
+    normal = como_agregados(FuenteDirectorio(ruta).cargar())
+    streaming_ = procesar_en_streaming(FuenteDirectorio(ruta), tam_bloque=4)
+    assert_mismo_reporte(normal, streaming_)
+
+
+def test_directorio_solo_reprocesa_archivos_modificados(tmp_path, monkeypatch):
+    ruta = crear_directorio(tmp_path / "club")
+    procesados = contar_archivos_procesados(monkeypatch)
+    fuente = FuenteDirectorio(ruta)
+    procesar_en_streaming(fuente, tam_bloque=4)
+    assert sorted(procesados) == ["a.xlsx", "b.xlsx", "c.xlsx"]
+
+    procesados.clear()
+    escribir_xlsx(tmp_path / "club" / "b.xlsx", filas_sesiones(6, desfase=5))
+    os.remove(tmp_path / "club" / "c.xlsx")
+    assert fuente.actualizar(streaming.agregados_archivo)
+    agregados = procesar_en_streaming(fuente, tam_bloque=4)
+    assert procesados == ["b.xlsx"]
+    assert_mismo_reporte(como_agregados(FuenteDirectorio(ruta).cargar()), agregados)
+
+
+def test_directorio_omite_archivos_invalidos(tmp_path):
+    ruta = crear_directorio(tmp_path / "club")
+    filas = filas_sesiones()
+    filas.insert(3, (99, "Pista", "sin fecha", 2, "05:00", "Base"))
+    escribir_xlsx(tmp_path / "club" / "d.xlsx", filas)
+    fuente = FuenteDirectorio(ruta)
+    agregados = procesar_en_streaming(fuente, tam_bloque=4)
+    assert [os.path.basename(r) for r in fuente.errores] == ["d.xlsx"]
+    normal = FuenteDirectorio(ruta)
+    assert_mismo_reporte(como_agregados(normal.cargar()), agregados)
+    assert list(normal.errores) == list(fuente.errores)
@@ -2,11 +2,13 @@ import pandas as pd
 import numpy as np
 import streamlit as st
 from bokeh.plotting import figure
-from bokeh.models import ColumnDataSource, DataTable, TableColumn, Div
+from bokeh.models import ColumnDataSource, DataTable, TableColumn, Div, Span, Label
 from scipy.stats import norm
 from bokeh.transform import dodge
 from bokeh.palettes import Category10
 
+from aggregates import N_MEJORES_SESIONES, como_agregados
+
 
 # =========================
 # Tamaño estándar para gráficos
@@ -60,46 +62,18 @@ def tab_estadisticas(df, nombre, club):
         minutos, segundos = divmod(total_segundos, 60)
         return f"{minutos:02d}:{segundos:02d}"
 
-    if df.empty or "Ritmos" not in df.columns:
+    agregados = como_agregados(df)
+    if agregados.empty:
         st.warning("No hay datos disponibles.")
         return ""
 
-    try:
-        entrenamientos_totales = (df['Distancia_km'] == 1).sum()
-    except Exception:
-        entrenamientos_totales = len(df)
-
-    km_totales = len(df)  # ajusta según cómo calculas
-
-    ritmo_promedio_raw = df["Ritmos"].mean()
-    if pd.api.types.is_timedelta64_dtype(df["Ritmos"]):
-        ritmo_promedio_td = ritmo_promedio_raw
-    else:
-        ritmo_promedio_td = pd.to_timedelta(
-            float(_ritmo_to_minutos(df["Ritmos"]).mean()), unit="m"
-        )
-
-    km_max = df.get("Distancia_km", pd.Series([np.nan])).max()
-
-    mejor_ritmo_raw = df["Ritmos"].min()
-    if pd.api.types.is_timedelta64_dtype(df["Ritmos"]):
-        mejor_ritmo_td = mejor_ritmo_raw
-    else:
-        mejor_ritmo_td = pd.to_timedelta(
-            float(_ritmo_to_minutos(df["Ritmos"]).min()), unit="m"
-        )
-
-    fila_mejor = df.loc[df["Ritmos"] == mejor_ritmo_raw].iloc[0] if not df.empty else None
-    mejor_fecha, mejor_lugar = "", ""
-    if fila_mejor is not None:
-        if "Fecha" in df.columns:
-            _ensure_fecha_datetime(df, "Fecha")
-            try:
-                mejor_fecha = fila_mejor["Fecha"].strftime("%d-%m-%Y")
-            except Exception:
-                mejor_fecha = str(fila_mejor["Fecha"])
-        if "Lugar" in df.columns:
-            mejor_lugar = str(fila_mejor["Lugar"])
+    entrenamientos_totales = agregados.sesiones_totales
+    km_totales = agregados.n_filas  # una fila por km
+    ritmo_promedio_td = agregados.ritmo_promedio
+    km_max = agregados.km_max
+    mejor_ritmo_td = agregados.mejor_ritmo
+    mejor_fecha = agregados.mejor_fecha.strftime("%d-%m-%Y")
+    mejor_lugar = agregados.mejor_lugar
 
     # Mostrar en la app con columnas
     col1, col2, col3 = st.columns(3)
@@ -154,16 +128,17 @@ def tab_estadisticas(df, nombre, club):
 
 
 # ====================================================================
-def tab_histograma_ritmos(df):
-    
-    if df.empty or "Ritmos" not in df.columns:
-        return figure(title="No hay datos de ritmos disponibles")
+def tab_histograma_ritmos(df, bins="fd", superposicion="normal", percentiles=()):
+    """Histograma de ritmos con curva superpuesta ("normal", "kde" o None) y líneas de percentiles.
 
-    ritmos_min = _ritmo_to_minutos(df["Ritmos"]).dropna()
-    if ritmos_min.empty:
+    `bins` admite un número fijo o una regla ("fd", "scott"). La distribución es
+    la de los agregados, combinada a partir de los resúmenes por archivo.
+    """
+    distribucion = como_agregados(df).distribucion
+    if not distribucion.n:
         return figure(title="No hay datos de ritmos disponibles")
 
-    hist, edges = np.histogram(ritmos_min, bins=20)
+    hist, edges = distribucion.histograma(bins)
     p = figure(
         title=None,
         x_axis_label="Ritmo (min/km)",
@@ -173,10 +148,20 @@ def tab_histograma_ritmos(df):
     )
     p.quad(top=hist, bottom=0, left=edges[:-1], right=edges[1:], fill_color="navy", line_color="white", alpha=0.7)
 
-    mu, std = norm.fit(ritmos_min)
-    x = np.linspace(float(ritmos_min.min()), float(ritmos_min.max()), 100)
-    y = norm.pdf(x, mu, std) * len(ritmos_min) * (edges[1] - edges[0])
-    p.line(x, y, line_color="red", line_width=2)
+    # Curvas escaladas a frecuencia por bin
+    escala = distribucion.n * (edges[1] - edges[0])
+    if superposicion == "normal" and distribucion.desviacion > 0:
+        mu, std = distribucion.media, distribucion.desviacion
+        x = np.linspace(distribucion.minimo, distribucion.maximo, 100)
+        y = norm.pdf(x, mu, std) * escala
+        p.line(x, y, line_color="red", line_width=2)
+    elif superposicion == "kde":
+        x, densidad = distribucion.densidad_kde()
+        p.line(x, densidad * escala, line_color="red", line_width=2)
+
+    for pct, valor in zip(percentiles, distribucion.cuantiles([q / 100.0 for q in percentiles])):
+        p.add_layout(Span(location=valor, dimension="height", line_color="orange", line_dash="dashed", line_width=2))
+        p.add_layout(Label(x=valor, y=float(hist.max()), text=f"P{pct:g}", text_font_size="9pt", x_offset=3))
 
     return p
 
@@ -184,26 +169,19 @@ def tab_histograma_ritmos(df):
 # ====================================================================
 def tab_mejores_sesiones_ritmo_distancia(df):
     
-    if df.empty or "Ritmos" not in df.columns or "Distancia_km" not in df.columns or "Fecha" not in df.columns:
+    agregados = como_agregados(df)
+    if agregados.empty:
         return figure(title="No hay datos disponibles")
 
-    df_plot = df.copy()
-    _ensure_fecha_datetime(df_plot, "Fecha")
+    # Solo se conservan las filas de las mejores sesiones
+    df_plot = agregados.filas_mejores_sesiones()
     df_plot["Ritmo_min"] = _ritmo_to_minutos(df_plot["Ritmos"])
 
-    # Calcular el promedio de ritmo por sesión (Fecha)
-    sesiones = (
-        df_plot.groupby("Fecha")["Ritmo_min"]
-        .mean()
-        .reset_index()
-        .rename(columns={"Ritmo_min": "Ritmo_promedio"})
-    )
-
-    # Seleccionar las 5 sesiones más rápidas (menor Ritmo promedio)
-    top5_fechas = sesiones.nsmallest(5, "Ritmo_promedio")["Fecha"]
+    # Las 5 sesiones más rápidas (menor Ritmo promedio)
+    top5_fechas = agregados.fechas_mejores_sesiones(N_MEJORES_SESIONES)
 
     # Definir rango dinámico en eje X
-    max_distancia = df_plot["Distancia_km"].max()
+    max_distancia = agregados.km_max
     p = figure(
         title=None,
         x_axis_label="Distancia (km)",
@@ -238,12 +216,11 @@ def tab_mejores_sesiones_ritmo_distancia(df):
 # ====================================================================
 def tab_ritmo_medio_fecha(df):
     
-    if df.empty or "Fecha" not in df.columns or "Ritmos" not in df.columns:
+    agregados = como_agregados(df)
+    if agregados.empty:
         return figure(title="No hay datos disponibles")
 
-    df2 = df.copy()
-    _ensure_fecha_datetime(df2, "Fecha")
-    grp = df2.groupby("Fecha")["Ritmos"].mean().reset_index()
+    grp = agregados.por_sesion()[["Fecha", "Ritmos"]].copy()
     grp["Ritmo_min"] = _ritmo_to_minutos(grp["Ritmos"])
 
     source = ColumnDataSource(grp)
@@ -276,16 +253,12 @@ def tab_ritmo_medio_fecha(df):
 # ====================================================================
 def tab_tabla_por_fecha(df):
     
-    if df.empty:
+    agregados = como_agregados(df)
+    if agregados.empty:
         st.warning("No hay datos disponibles.")
         return Div(text="<p><b>No hay datos disponibles.</b></p>"), "<p><b>No hay datos disponibles.</b></p>"
 
-    df2 = df.copy()
-    _ensure_fecha_datetime(df2, "Fecha")
-    agg = df2.groupby("Fecha").agg({
-        "Distancia_km": "max",
-        "Ritmos": "mean"
-    }).reset_index()
+    agg = agregados.por_sesion()[["Fecha", "Distancia_km", "Ritmos"]].copy()
 
     def minutos_a_mmss(valor_min):
         total_sec = int(round(valor_min * 60))
@@ -326,10 +299,11 @@ def tab_tabla_por_fecha(df):
 
 # ====================================================================
 def tab_barras_lugares(df):
-    if df.empty or "Lugar" not in df.columns or "Periodo" not in df.columns:
+    agregados = como_agregados(df)
+    if agregados.empty:
         return figure(title="No hay datos de lugares o periodos", plot_width=900, plot_height=500)
 
-    df_group = df.groupby(["Lugar", "Periodo"]).size().reset_index(name="Conteo")
+    df_group = agregados.por_lugar_periodo()
 
     periodos = sorted(df_group["Periodo"].unique())
     pivot = df_group.pivot(index="Lugar", columns="Periodo", values="Conteo").fillna(0)
@@ -399,6 +373,9 @@ def tab_barras_lugares(df):
 # ====================================================================
 def tab_data_completo(df):
     
+    # En modo streaming la tabla completa no se conserva: se muestran las primeras filas
+    df = como_agregados(df).muestra()
+
     if df.empty:
         return Div(text="<p><b>No hay datos disponibles.</b></p>")
 